@@ -3,7 +3,6 @@
 
 import errno
 import fcntl
-import glob
 import grp
 import logging
 import os
@@ -12,7 +11,7 @@ import shlex
 import shutil
 import stat
 import tempfile
-import uuid
+import time
 
 from . import file_util
 from . import mounts
@@ -37,6 +36,9 @@ def noop_in_bootstrap(f):
 
 
 class Buildroot(object):
+    # nuke_rpm_db() doesn't trust var/lib/rpm timestamps younger than this
+    _RPMDB_RACY_SECONDS = 2
+
     @traceLog()
     def __init__(self, config, uid_manager, state, plugins, bootstrap_buildroot=None, is_bootstrap=False):
         self.config = config
@@ -57,6 +59,13 @@ class Buildroot(object):
         if is_bootstrap:
             self.rootdir = os.path.join(self.basedir, 'root')
 
+        # frequently used paths in chroot
+        self._initialized_marker = self.make_chroot_path('.initialized')
+        # True once the marker is known to exist, reset by finalize() and delete()
+        self._initialized_marker_exists = False
+        self._dev_ptmx = self.make_chroot_path('dev', 'ptmx')
+        self._etc_mtab = self.make_chroot_path('etc', 'mtab')
+
         self.resultdir = text.compat_expand_string(config['resultdir'], config)
 
         # In bootstrap buildroot, resultdir _should_ be basically unused (nobody
@@ -80,6 +89,9 @@ class Buildroot(object):
         self.cachedir = os.path.join(self.cache_topdir, self.shared_root_name)
         self.builddir = os.path.join(self.homedir, 'build')
         self._lock_file = None
+        # stat() signature of var/lib/rpm when we last found it without
+        # __db* files, see nuke_rpm_db()
+        self._rpmdb_signature = None
         self.selinux = (not self.config['plugin_conf']['selinux_enable']
                         and util.selinuxEnabled())
 
@@ -87,6 +99,8 @@ class Buildroot(object):
         self.chrootuser = config['chrootuser']
         self.chrootgid = config['chrootgid']
         self.chrootgroup = config['chrootgroup']
+        # rendering the template is not cheap, and it doesn't change
+        self._useradd_cmd = shlex.split(config['useradd'])
         self.env = config['environment']
         self.env['HOME'] = self.homedir
         proxy_env = util.get_proxy_environment(config)
@@ -113,14 +127,8 @@ class Buildroot(object):
         self._setup_nspawn_btrfs_device()
         self._setup_nspawn_loop_devices()
 
-    @traceLog()
     def make_chroot_path(self, *paths):
-        new_path = self.rootdir
-        for path in paths:
-            if path.startswith('/'):
-                path = path[1:]
-            new_path = os.path.join(new_path, path)
-        return new_path
+        return os.path.join(self.rootdir, *[path.lstrip('/') for path in paths])
 
     @traceLog()
     def initialize(self, prebuild=False, do_log=True):
@@ -141,7 +149,9 @@ class Buildroot(object):
 
     @traceLog()
     def chroot_is_initialized(self):
-        return os.path.exists(self.make_chroot_path('.initialized'))
+        if not self._initialized_marker_exists:
+            self._initialized_marker_exists = os.path.lexists(self._initialized_marker)
+        return self._initialized_marker_exists
 
     @traceLog()
     def _setup_result_dir(self):
@@ -168,7 +178,9 @@ class Buildroot(object):
         getLog().info("calling preinit hooks")
         self.plugins.call_hooks('preinit')
         # intentionally we do not call bootstrap hook here - it does not have sense
-        self.chroot_was_initialized = self.chroot_is_initialized()
+        if not self.chroot_was_initialized:
+            # preinit hooks (e.g. root_cache) may have restored initialized chroot
+            self.chroot_was_initialized = self.chroot_is_initialized()
         if self.uses_bootstrap_image and not self.chroot_was_initialized:
             podman = Podman(self, self.bootstrap_image)
             podman.pull_image()
@@ -238,7 +250,9 @@ class Buildroot(object):
                 self.chown_home_dir()
 
         # mark the buildroot as initialized
-        file_util.touch(self.make_chroot_path('.initialized'))
+        os.close(os.open(self._initialized_marker,
+                         os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC, 0o666))
+        self._initialized_marker_exists = True
 
         # done with init
         self.plugins.call_hooks('postinit')
@@ -302,7 +316,7 @@ class Buildroot(object):
                 linkto = os.readlink(orig_conf_file)
                 os.symlink(linkto, conf_file)
             else:
-                shutil.copy2(orig_conf_file, conf_file)
+                file_util.copy2(orig_conf_file, conf_file)
         elif warn:
             self.root_log.warning("File %s not present. It is not copied into the chroot.", orig_conf_file)
 
@@ -321,13 +335,17 @@ class Buildroot(object):
 
     @traceLog()
     def _setup_dbus_uuid(self):
-        machine_uuid = uuid.uuid4().hex
+        # random (version 4) UUID, without the uuid module overhead
+        machine_uuid = bytearray(os.urandom(16))
+        machine_uuid[6] = (machine_uuid[6] & 0x0f) | 0x40
+        machine_uuid[8] = (machine_uuid[8] & 0x3f) | 0x80
+        machine_uuid = machine_uuid.hex()
         dbus_uuid_path = self.make_chroot_path('etc', 'machine-id')
         symlink_path = self.make_chroot_path('var', 'lib', 'dbus', 'machine-id')
         with open(dbus_uuid_path, 'w') as uuid_file:
             uuid_file.write(machine_uuid)
             uuid_file.write('\n')
-        if not os.path.exists(symlink_path):
+        if not os.path.lexists(symlink_path):
             os.symlink("../../../etc/machine-id", symlink_path)
 
     @traceLog()
@@ -410,20 +428,21 @@ class Buildroot(object):
         file_util.rmtree(self.make_chroot_path(self.homedir),
                     selinux=self.selinux, exclude=excluded)
 
-        # ok for these two to fail
         if self.config['clean']:
-            self.doChroot(['/usr/sbin/userdel', '-r', '-f', self.chrootuser],
-                          shell=False, raiseExc=False, nosync=True)
+            userdel = ['/usr/sbin/userdel', '-r', '-f', self.chrootuser]
         else:
-            self.doChroot(['/usr/sbin/userdel', '-f', self.chrootuser],
-                          shell=False, raiseExc=False, nosync=True)
-        self.doChroot(['/usr/sbin/groupdel', self.chrootgroup],
-                      shell=False, raiseExc=False, nosync=True)
-
+            userdel = ['/usr/sbin/userdel', '-f', self.chrootuser]
+        groupdel = ['/usr/sbin/groupdel', self.chrootgroup]
+        add_commands = [self._useradd_cmd]
         if self.chrootgid:
-            self.doChroot(['/usr/sbin/groupadd', '-g', self.chrootgid, self.chrootgroup],
-                          shell=False, nosync=True)
-        self.doChroot(shlex.split(self.config['useradd']), shell=False, nosync=True)
+            add_commands.insert(0, ['/usr/sbin/groupadd', '-g', str(self.chrootgid),
+                                    self.chrootgroup])
+
+        # Run everything by one chroot process.  It is ok for userdel and
+        # groupdel to fail, but not for groupadd && useradd.
+        script = '; '.join([util.cmd_pretty(userdel), util.cmd_pretty(groupdel),
+                            ' && '.join(util.cmd_pretty(cmd) for cmd in add_commands)])
+        self.doChroot(script, shell=True, nosync=True)
         if not self.config['clean']:
             self.uid_manager.changeOwner(self.make_chroot_path(self.homedir))
         self._enable_chrootuser_account()
@@ -432,19 +451,19 @@ class Buildroot(object):
     def _enable_chrootuser_account(self):
         passwd = self.make_chroot_path('/etc/passwd')
         with open(passwd) as f:
-            lines = f.readlines()
-        disabled = False
-        newlines = []
-        for l in lines:
-            parts = l.strip().split(':')
-            if parts[0] == self.chrootuser and parts[1].startswith('!!'):
-                disabled = True
-                parts[1] = parts[1][2:]
-            newlines.append(':'.join(parts))
-        if disabled:
-            with open(passwd, "w") as f:
-                for l in newlines:
-                    f.write(l + '\n')
+            data = f.read()
+        # look for the "user:!!" prefix of the disabled account line
+        marker = self.chrootuser + ':!!'
+        if data.startswith(marker):
+            pos = 0
+        else:
+            pos = data.find('\n' + marker)
+            if pos == -1:
+                return
+            pos += 1
+        pos += len(self.chrootuser) + 1
+        with open(passwd, "w") as f:
+            f.write(data[:pos] + data[pos + 2:])
 
     @traceLog()
     def _resetLogging(self, force=False):
@@ -480,7 +499,8 @@ class Buildroot(object):
                         handler.close()
                         log.removeHandler(handler)
                 fullPath = os.path.join(self.resultdir, filename)
-                fh = logging.FileHandler(fullPath, "a+")
+                # the file is opened only once something is logged
+                fh = logging.FileHandler(fullPath, "a+", delay=True)
                 formatter = logging.Formatter(fmt_str)
                 fh.setFormatter(formatter)
                 fh.setLevel(logging.NOTSET)
@@ -490,19 +510,38 @@ class Buildroot(object):
     @traceLog()
     def _init_aux_files(self):
         chroot_file_contents = self.config['files']
-        for key in chroot_file_contents:
+        missing = {}
+        for key, content in chroot_file_contents.items():
             p = self.make_chroot_path(key)
-            if not os.path.exists(p):
-                file_util.mkdirIfAbsent(os.path.dirname(p))
-                with open(p, 'w+') as fo:
-                    fo.write(chroot_file_contents[key])
+            if not os.path.lexists(p):
+                missing[p] = content
+        # the files usually share just a few parent directories
+        file_util.mkdirIfAbsent(*sorted({os.path.dirname(p) for p in missing}))
+        for p, content in missing.items():
+            with open(p, 'w+') as fo:
+                fo.write(content)
 
     @traceLog()
     def nuke_rpm_db(self):
         """remove rpm DB lock files from the chroot"""
 
-        dbfiles = glob.glob(self.make_chroot_path('var/lib/rpm/__db*'))
+        rpmdb_path = self.make_chroot_path('var/lib/rpm')
+        try:
+            st = os.stat(rpmdb_path)
+        except FileNotFoundError:
+            return
+        signature = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_ctime_ns)
+        # no files were added or removed since the last check
+        if signature == self._rpmdb_signature:
+            return
+        with os.scandir(rpmdb_path) as entries:
+            dbfiles = [entry.path for entry in entries if entry.name.startswith('__db')]
         if not dbfiles:
+            # Directory timestamps have coarse granularity, files created
+            # later within the same tick wouldn't change them.  So trust the
+            # signature only if the directory was modified long enough ago.
+            if time.time() - st.st_mtime > self._RPMDB_RACY_SECONDS:
+                self._rpmdb_signature = signature
             return
         self.root_log.debug("removing %d rpm db files", len(dbfiles))
         # become root
@@ -521,7 +560,9 @@ class Buildroot(object):
     @traceLog()
     def _open_lock(self):
         file_util.mkdirIfAbsent(self.basedir)
-        self._lock_file = open(os.path.join(self.basedir, "buildroot.lock"), "a+")
+        fd = os.open(os.path.join(self.basedir, "buildroot.lock"),
+                     os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o666)
+        self._lock_file = os.fdopen(fd, "r+")
 
     @traceLog()
     def _lock_buildroot(self, exclusive):
@@ -560,7 +601,15 @@ class Buildroot(object):
                 'sys']
         dirs += self.config['extra_chroot_dirs']
         for item in dirs:
-            file_util.mkdirIfAbsent(self.make_chroot_path(item))
+            path = self.make_chroot_path(item)
+            # optimistic mkdir(), saves the stat() in mkdirIfAbsent()
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                pass
+            except OSError:
+                # e.g. missing parent directory
+                file_util.mkdirIfAbsent(path)
 
     @traceLog()
     def chown_home_dir(self):
@@ -612,13 +661,16 @@ class Buildroot(object):
         build_dirs = ['RPMS', 'SPECS', 'SRPMS', 'SOURCES', 'BUILD', 'BUILDROOT',
                       'originals']
         file_util.mkdirIfAbsent(self.make_chroot_path(self.builddir))
+        clean = self.config['clean']
         with self.uid_manager:
             self.uid_manager.changeOwner(self.make_chroot_path(self.builddir))
             for item in build_dirs:
                 path = self.make_chroot_path(self.builddir, item)
                 file_util.mkdirIfAbsent(path)
-                self.uid_manager.changeOwner(path)
-            if self.config['clean']:
+                # with clean, chown_home_dir() below fixes the whole tree
+                if not clean:
+                    self.uid_manager.changeOwner(path)
+            if clean:
                 self.chown_home_dir()
             self._prepare_rpm_macros()
 
@@ -668,13 +720,13 @@ class Buildroot(object):
             ]
             for i in range(self.config['dev_loop_count']):
                 devFiles.append((stat.S_IFBLK | 0o666, os.makedev(7, i), "dev/loop{loop_number}".format(loop_number=i)))
-            kver = os.uname()[2]
-            self.root_log.debug("kernel version == %s", kver)
+            self.root_log.debug("kernel version == %s", os.uname()[2])
+            relabel = []
             for i in devFiles:
                 src_path = "/" + i[2]
                 chroot_path = self.make_chroot_path(i[2])
 
-                if util.cmpKernelVer(kver, '2.6.18') >= 0 and src_path == '/dev/ptmx':
+                if src_path == '/dev/ptmx' and util.cmpHostKernelVer('2.6.18') >= 0:
                     continue
 
                 if os.path.ismount(chroot_path):
@@ -702,30 +754,35 @@ class Buildroot(object):
                     # an existing one:
 
                     # set context. (only necessary if host running selinux enabled.)
-                    # fails gracefully if chcon not installed.
                     if self.selinux:
-                        util.do(["chcon", "--reference=" + src_path, chroot_path],
-                                raiseExc=0, shell=False, env=self.env)
+                        relabel.append((src_path, chroot_path))
 
                     if src_path in ('/dev/tty', '/dev/ptmx'):
                         os.chown(chroot_path, pwd.getpwnam('root')[2], grp.getgrnam('tty')[2])
 
+            # relabel all the created nodes at once, one chcon process per
+            # node would be way too expensive;  fails gracefully if chcon
+            # is not installed.
+            if relabel:
+                script = "; ".join("chcon --reference={0} {1}".format(
+                    shlex.quote(src), shlex.quote(dst)) for src, dst in relabel)
+                util.do(script, raiseExc=0, shell=True, env=self.env)
+
             os.symlink("/proc/self/fd/0", self.make_chroot_path("dev/stdin"))
             os.symlink("/proc/self/fd/1", self.make_chroot_path("dev/stdout"))
             os.symlink("/proc/self/fd/2", self.make_chroot_path("dev/stderr"))
 
-            if os.path.isfile(self.make_chroot_path('etc', 'mtab')) or \
-               os.path.islink(self.make_chroot_path('etc', 'mtab')):
-                os.remove(self.make_chroot_path('etc', 'mtab'))
-            os.symlink("../proc/self/mounts", self.make_chroot_path('etc', 'mtab'))
+            if os.path.isfile(self._etc_mtab) or os.path.islink(self._etc_mtab):
+                os.remove(self._etc_mtab)
+            os.symlink("../proc/self/mounts", self._etc_mtab)
 
             # symlink /dev/fd in the chroot for everything except RHEL4
-            if util.cmpKernelVer(kver, '2.6.9') > 0:
+            if util.cmpHostKernelVer('2.6.9') > 0:
                 os.symlink("/proc/self/fd", self.make_chroot_path("dev/fd"))
 
             os.umask(prevMask)
 
-            os.symlink("pts/ptmx", self.make_chroot_path('/dev/ptmx'))
+            os.symlink("pts/ptmx", self._dev_ptmx)
 
     @traceLog()
     def _setup_files(self):
@@ -794,9 +851,11 @@ class Buildroot(object):
         buildroot (exclusive lock can be acquired) also kill orphan processes,
         unmount mounts and call postumount hooks.
         """
+        # postumount hooks (e.g. tmpfs) may drop the chroot contents
+        self._initialized_marker_exists = False
         if self.tmpdir:
             for d in self.tmpdir, self.make_chroot_path(self.tmpdir):
-                if os.path.exists(d):
+                if os.path.lexists(d):
                     shutil.rmtree(d)
         if os.path.exists(self.make_chroot_path()):
             try:
@@ -853,7 +912,8 @@ class Buildroot(object):
         """
         Deletes the buildroot contents.
         """
-        if os.path.exists(self.basedir):
+        self._initialized_marker_exists = False
+        if os.path.lexists(self.basedir):
             p = self.make_chroot_path()
             self._lock_buildroot(exclusive=True)
             util.orphansKill(p)
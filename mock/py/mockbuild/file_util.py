@@ -3,6 +3,7 @@
 import errno
 import os
 import os.path
+import shutil
 import stat
 import subprocess
 import time
@@ -31,6 +32,29 @@ def touch(fileName):
     open(fileName, 'a').close()
 
 
+@traceLog()
+def copy2(src, dst):
+    """Version of shutil.copy2 which copies the data in kernel by
+       os.sendfile(), dst must be a file name"""
+    getLog().debug("copying file: %s -> %s", src, dst)
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        # st_size is 0 for e.g. /proc files, so read until EOF
+        blocksize = max(os.fstat(fsrc.fileno()).st_size, 2 ** 20)
+        offset = 0
+        try:
+            while True:
+                sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, blocksize)
+                if not sent:
+                    break
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS) or offset:
+                raise
+            # sendfile() not supported for this file, copy in userspace
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
+
+
 @traceLog()
 def rmtree(path, selinux=False, exclude=()):
     """Version of shutil.rmtree that ignores no-such-file-or-directory errors,
@@ -11,6 +11,12 @@ from . import util
 from .trace_decorator import traceLog
 
 
+def mounted_paths():
+    """ set of all mount points currently listed in /proc/mounts """
+    with open('/proc/mounts') as f:
+        return {x.split(None, 2)[1] for x in f}
+
+
 class MountPoint(object):
     '''base class for mounts'''
     @traceLog()
@@ -19,11 +25,10 @@ class MountPoint(object):
         self.mountsource = mountsource
 
     @traceLog()
-    def ismounted(self):
-        with open('/proc/mounts') as f:
-            if self.mountpath.rstrip('/') in [x.split()[1] for x in f]:
-                return True
-        return False
+    def ismounted(self, mounted=None):
+        if mounted is None:
+            mounted = mounted_paths()
+        return self.mountpath.rstrip('/') in mounted
 
     def __repr__(self):
         return "<mockbuild.mounts.MountPoint object [mountsource: {0}, mountpath: {1}]>".format(
@@ -33,7 +38,7 @@ class MountPoint(object):
 class FileSystemMountPoint(MountPoint):
     '''class for managing filesystem mounts in the chroot'''
     @traceLog()
-    def __init__(self, path, filetype=None, device=None, options=None):
+    def __init__(self, path, filetype=None, device=None, options=None, mounted=None):
         if not path:
             raise RuntimeError("no path specified for mountpoint")
         if not filetype:
@@ -48,7 +53,7 @@ class FileSystemMountPoint(MountPoint):
         self.path = path
         self.filetype = filetype
         self.options = options
-        self.mounted = self.ismounted()
+        self.mounted = self.ismounted(mounted)
 
     @traceLog()
     def mount(self):
@@ -86,13 +91,13 @@ class FileSystemMountPoint(MountPoint):
 class BindMountPoint(MountPoint):
     '''class for managing bind-mounts in the chroot'''
     @traceLog()
-    def __init__(self, srcpath, bindpath, recursive=False, options=None):
+    def __init__(self, srcpath, bindpath, recursive=False, options=None, mounted=None):
         MountPoint.__init__(self, mountsource=srcpath, mountpath=bindpath)
         self.srcpath = srcpath
         self.bindpath = bindpath
         self.recursive = recursive
         self.options = options
-        self.mounted = self.ismounted()
+        self.mounted = self.ismounted(mounted)
 
     @traceLog()
     def mount(self):
@@ -147,6 +152,9 @@ class Mounts(object):
         self.user_mounts = []  # mounts injected by user
         self.essential_mounts = []
 
+        # parse /proc/mounts just once for all the essential mounts
+        mounted = mounted_paths()
+
         # Instead of mounting a fresh procfs and sysfs, we bind mount /proc
         # and /sys. This avoids problems with kernel restrictions if running
         # within a user namespace, and is pretty much identical otherwise.
@@ -179,11 +187,13 @@ class Mounts(object):
                 FileSystemMountPoint(filetype='tmpfs',
                                      device=device,
                                      path=host_path,
-                                     options="rprivate"),
+                                     options="rprivate",
+                                     mounted=mounted),
                 BindMountPoint(srcpath=mount_point,
                                bindpath=host_path,
                                recursive=True,
-                               options="nodev,noexec,nosuid,readonly,rprivate"),
+                               options="nodev,noexec,nosuid,readonly,rprivate",
+                               mounted=mounted),
             ]
 
         if rootObj.config['internal_dev_setup']:
@@ -191,21 +201,23 @@ class Mounts(object):
                 FileSystemMountPoint(
                     filetype='tmpfs',
                     device='mock_chroot_shmfs',
-                    path=rootObj.make_chroot_path('/dev/shm')
+                    path=rootObj.make_chroot_path('/dev/shm'),
+                    mounted=mounted,
                 )
             )
             opts = 'gid=%d,mode=0620,ptmxmode=0666' % grp.getgrnam('tty').gr_gid
-            if util.cmpKernelVer(os.uname()[2], '2.6.29') >= 0:
+            if util.cmpHostKernelVer('2.6.29') >= 0:
                 opts += ',newinstance'
                 self.essential_mounts.append(
                     FileSystemMountPoint(
                         filetype='devpts',
                         device='mock_chroot_devpts',
                         path=rootObj.make_chroot_path('/dev/pts'),
-                        options=opts
+                        options=opts,
+                        mounted=mounted,
                     )
                 )
-        self.essential_mounted = all(m.ismounted() for m in self.essential_mounts)
+        self.essential_mounted = all(m.mounted for m in self.essential_mounts)
 
     @traceLog()
     def add(self, mount):
@@ -23,11 +23,12 @@ def lvm_do(*args, **kwargs):
 
 
 def current_mounts():
+    # mount points in /proc/mounts are already canonical, only the source
+    # (e.g. /dev/mapper/ symlink) needs to be resolved
     with open("/proc/mounts") as proc_mounts:
-        mount_lines = proc_mounts.read().strip().split('\n')
-    for line in mount_lines:
-        src, target = [os.path.realpath(x) for x in line.split()[:2]]
-        yield src, target
+        for line in proc_mounts:
+            src, target = line.split(None, 2)[:2]
+            yield os.path.realpath(src), target
 
 
 class Lock(object):
@@ -249,9 +250,10 @@ class LvmPlugin(object):
         mount_options = self.lvm_conf.get('mount_options')
         lv_path = self.get_lv_path()
         if lv_path:
+            lv_realpath = os.path.realpath(lv_path)
             for src, target in current_mounts():
                 if target == self.root_path:
-                    if src != os.path.realpath(lv_path):
+                    if src != lv_realpath:
                         self.force_umount_root()
             self.mount = mounts.FileSystemMountPoint(self.root_path, self.fs_type,
                                                      lv_path, options=mount_options)
@@ -345,9 +347,10 @@ class LvmPlugin(object):
         self.pool_lock.lock(exclusive=True)
         lvs = self.list_our_lvs('lv_path')
         for name, lv_path in lvs:
-            for src, _ in current_mounts():
-                if src == os.path.realpath(lv_path):
-                    util.do(['umount', '-l', src])
+            lv_realpath = os.path.realpath(lv_path)
+            srcs = [src for src, _ in current_mounts() if src == lv_realpath]
+            if srcs:
+                util.do(['umount', '-l'] + srcs)
             self.buildroot.root_log.info("removing {0} volume".format(name))
             lvm_do(['lvremove', '-f', self.vg_name + '/' + name])
         remaining = [name for name, attr, pool_lv in self.query_lvs('lv_name', 'lv_attr', 'pool_lv')
@@ -98,11 +98,23 @@ class UidManager(object):
             gid = self.unprivGid
         self._tolerant_chown(path, uid, gid)
         if recursive:
-            for root, dirs, files in os.walk(path):
-                for d in dirs:
-                    self._tolerant_chown(os.path.join(root, d), uid, gid)
-                for f in files:
-                    self._tolerant_chown(os.path.join(root, f), uid, gid)
+            self._tolerant_chown_tree(path, uid, gid)
+
+    @classmethod
+    def _tolerant_chown_tree(cls, path, uid, gid):
+        """ chown() everything below path, symlinks are not followed """
+        stack = [path]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                # same as os.walk(), ignore directories we can not list
+                continue
+            with entries:
+                for entry in entries:
+                    cls._tolerant_chown(entry.path, uid, gid)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
 
     @staticmethod
     def _tolerant_chown(path, uid, gid):
@@ -84,6 +84,11 @@ USE_NSPAWN = False
 
 _NSPAWN_HELP_OUTPUT = None
 
+# host facts which don't change during mock run, see selinuxEnabled() and
+# cmpHostKernelVer()
+_SELINUX_ENABLED = None
+_HOST_KERNEL_VER_CMP = {}
+
 RHEL_CLONES = ['centos', 'deskos', 'ol', 'rhel', 'scientific']
 
 _OPS_TIMEOUT = 0
@@ -246,6 +251,13 @@ def cmpKernelVer(str1, str2):
     return rpm.labelCompare(('', str1, ''), ('', str2, ''))
 
 
+def cmpHostKernelVer(version):
+    'cached cmpKernelVer() of the running kernel version against version'
+    if version not in _HOST_KERNEL_VER_CMP:
+        _HOST_KERNEL_VER_CMP[version] = cmpKernelVer(os.uname()[2], version)
+    return _HOST_KERNEL_VER_CMP[version]
+
+
 @traceLog()
 def getAddtlReqs(hdr, conf):
     # Add the 'more_buildreqs' for this SRPM (if defined in config file)
@@ -464,7 +476,14 @@ def logOutput(fdout, fderr, logger, returnOutput=1, start=0, timeout=0, printOut
 
 @traceLog()
 def selinuxEnabled():
-    """Check if SELinux is enabled (enforcing or permissive)."""
+    """Check if SELinux is enabled (enforcing or permissive), cached."""
+    global _SELINUX_ENABLED  # pylint: disable=global-statement
+    if _SELINUX_ENABLED is None:
+        _SELINUX_ENABLED = _selinux_enabled()
+    return _SELINUX_ENABLED
+
+
+def _selinux_enabled():
     with open("/proc/mounts") as f:
         for mount in f.readlines():
             (fstype, mountpoint, _) = mount.split(None, 2)
@@ -1,6 +1,10 @@
 """ Tests for buildroot.py """
 
-from unittest.mock import MagicMock
+import os
+
+import pytest
+
+from unittest.mock import MagicMock, patch
 from mockbuild import util, buildroot
 
 
@@ -22,3 +26,75 @@ def test_module_config():
 
     _check([("info", "")], [["module", "info"]])
     _check([("info", None)], [["module", "info"]])
+
+
+def test_make_chroot_path():
+    """ test make_chroot_path method """
+    root = buildroot.Buildroot.__new__(buildroot.Buildroot)
+    root.rootdir = "/var/lib/mock/root"
+    assert root.make_chroot_path() == "/var/lib/mock/root"
+    assert root.make_chroot_path("/etc", "mtab") == "/var/lib/mock/root/etc/mtab"
+    assert root.make_chroot_path("/builddir", "build") == "/var/lib/mock/root/builddir/build"
+    assert root.make_chroot_path("dev/ptmx") == "/var/lib/mock/root/dev/ptmx"
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("mockbuild:!!:1000:135::/builddir:/bin/bash\n",
+     "mockbuild::1000:135::/builddir:/bin/bash\n"),
+    ("root:x:0:0:root:/root:/bin/bash\nmockbuild:!!:1000:135::/builddir:/bin/bash\n",
+     "root:x:0:0:root:/root:/bin/bash\nmockbuild::1000:135::/builddir:/bin/bash\n"),
+    ("root:x:0:0:root:/root:/bin/bash\nmockbuild:x:1000:135::/builddir:/bin/bash\n",
+     "root:x:0:0:root:/root:/bin/bash\nmockbuild:x:1000:135::/builddir:/bin/bash\n"),
+    ("xmockbuild:!!:1001:135::/builddir:/bin/bash\n",
+     "xmockbuild:!!:1001:135::/builddir:/bin/bash\n"),
+])
+def test_enable_chrootuser_account(tmpdir, content, expected):
+    """ test _enable_chrootuser_account method """
+    root = buildroot.Buildroot.__new__(buildroot.Buildroot)
+    root.rootdir = str(tmpdir)
+    root.chrootuser = "mockbuild"
+    tmpdir.mkdir("etc").join("passwd").write(content)
+    root._enable_chrootuser_account()
+    assert tmpdir.join("etc", "passwd").read() == expected
+
+
+def test_nuke_rpm_db(tmpdir):
+    """ test nuke_rpm_db method and its stat() signature cache """
+    root = buildroot.Buildroot.__new__(buildroot.Buildroot)
+    root.rootdir = str(tmpdir)
+    root._rpmdb_signature = None
+    root.uid_manager = MagicMock()
+    root.root_log = MagicMock()
+    rpmdb = tmpdir.mkdir("var").mkdir("lib").mkdir("rpm")
+    rpmdb.join("Packages").write("")
+
+    def age_rpmdb():
+        # pretend the last modification happened long ago
+        old = os.stat(str(rpmdb)).st_mtime - 60
+        os.utime(str(rpmdb), (old, old))
+
+    def nuke():
+        with patch("os.scandir", wraps=os.scandir) as scandir:
+            root.nuke_rpm_db()
+        return scandir.call_count
+
+    # files present, then removed
+    rpmdb.join("__db.001").write("")
+    rpmdb.join("__db.002").write("")
+    age_rpmdb()
+    assert nuke() == 1
+    assert sorted(os.listdir(str(rpmdb))) == ["Packages"]
+
+    # directory modified just now is always re-scanned
+    assert nuke() == 1
+    assert nuke() == 1
+
+    # unchanged (old enough) directory is skipped
+    age_rpmdb()
+    assert nuke() == 1
+    assert nuke() == 0
+
+    # files re-added are removed again
+    rpmdb.join("__db.003").write("")
+    assert nuke() == 1
+    assert sorted(os.listdir(str(rpmdb))) == ["Packages"]